@@ -5,13 +5,24 @@ public/data/daily_risk_score.json に保存するスクリプト。
 """
 
 import io
-import json
 import logging
+import queue
+import struct
+import threading
 import zipfile
+import zlib
 from pathlib import Path
+from urllib.parse import urlparse
 
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import requests
+from pyarrow import csv as pacsv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
@@ -40,6 +51,28 @@ GDELT_COLUMNS = [
     "ActionGeo_FeatureID", "DATEADDED", "SOURCEURL",
 ]
 
+# 集計に使うカラムとその型（それ以外の列はパースせず読み飛ばす）
+USED_COLUMNS = ["Actor1Geo_CountryCode", "QuadClass", "EventRootCode", "GoldsteinScale", "SOURCEURL"]
+COLUMN_TYPES = {
+    "Actor1Geo_CountryCode": pa.string(),
+    "QuadClass": pa.int8(),
+    "EventRootCode": pa.int8(),
+    "GoldsteinScale": pa.float64(),
+    "SOURCEURL": pa.string(),
+}
+# 数値列は CSV リーダーでは文字列として読み、バッチごとに型変換する。
+# 数値でないセルが 1 つあっても取得全体を失敗させず、そのセルだけ欠損値として扱うため。
+NUMERIC_COLUMNS = ["QuadClass", "EventRootCode", "GoldsteinScale"]
+_BATCH_SCHEMA = pa.schema([(name, COLUMN_TYPES[name]) for name in USED_COLUMNS])
+
+# pyarrow CSV リーダーのオプションは呼び出しごとに組み立てず使い回す
+_CSV_READ_OPTIONS = pacsv.ReadOptions(column_names=GDELT_COLUMNS, block_size=8 << 20, use_threads=True)
+_CSV_PARSE_OPTIONS = pacsv.ParseOptions(delimiter="\t")
+_CSV_CONVERT_OPTIONS = pacsv.ConvertOptions(
+    include_columns=USED_COLUMNS,
+    column_types={name: pa.string() for name in USED_COLUMNS},
+)
+
 # ---------------------------------------------------------------------------
 # FIPS 10-4 → ISO 3166-1 alpha-3 変換辞書
 # GDELTの Actor1Geo_CountryCode は FIPS 10-4 形式
@@ -114,6 +147,27 @@ TARGET_ISO3 = {
     "GUY", "SUR",
 }
 
+
+def _build_fips_lut() -> tuple:
+    """
+    FIPS コード（英大文字 2 文字）→ ISO3 の 26×26 ルックアップテーブルを構築する。
+
+    LUT[(c0 - 'A') * 26 + (c1 - 'A')] が ISO3 リスト上の添字を指す。
+    ターゲット地域外の国は最初から -1（未定義）としておき、FIPS の妥当性と
+    ターゲット地域の判定を 1 回のテーブル参照で済ませる。
+    """
+    iso3_list = sorted({iso3 for iso3 in FIPS_TO_ISO3.values() if iso3 in TARGET_ISO3})
+    iso3_index = {iso3: i for i, iso3 in enumerate(iso3_list)}
+    lut = np.full(26 * 26, -1, dtype=np.int16)
+    for fips, iso3 in FIPS_TO_ISO3.items():
+        if iso3 not in iso3_index:
+            continue
+        lut[(ord(fips[0]) - ord("A")) * 26 + (ord(fips[1]) - ord("A"))] = iso3_index[iso3]
+    return lut, iso3_list
+
+
+_FIPS_LUT, ISO3_LIST = _build_fips_lut()
+
 # ---------------------------------------------------------------------------
 # 出力先
 # ---------------------------------------------------------------------------
@@ -121,11 +175,21 @@ OUTPUT_PATH = Path(__file__).resolve().parent.parent / "public" / "data" / "dail
 
 LASTUPDATE_URL = "http://data.gdeltproject.org/gdeltv2/lastupdate.txt"
 
+# lastupdate.txt とエクスポート ZIP の取得で接続を使い回すセッション（一時的な 5xx は再試行する）
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]))
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# ダウンロード〜解凍〜パースのパイプラインで受け渡すチャンクサイズと、先読みするチャンク数
+_CHUNK_SIZE = 1 << 20
+_PREFETCH_CHUNKS = 8
+
 
 def fetch_latest_export_url() -> str:
     """lastupdate.txt から最新の export.CSV.zip の URL を取得する。"""
     logger.info("Fetching lastupdate.txt ...")
-    resp = requests.get(LASTUPDATE_URL, timeout=30)
+    resp = _SESSION.get(LASTUPDATE_URL, timeout=30)
     resp.raise_for_status()
     for line in resp.text.splitlines():
         parts = line.strip().split()
@@ -136,111 +200,283 @@ def fetch_latest_export_url() -> str:
     raise ValueError("export.CSV.zip URL not found in lastupdate.txt")
 
 
+def _stream_chunks(resp: requests.Response, chunks: queue.Queue, stop: threading.Event) -> None:
+    """
+    HTTP レスポンス本体をチャンク単位でキューへ流し込む（プロデューサースレッド）。
+
+    終端には None を、受信中の例外は例外オブジェクトそのものを置く。
+    消費側が stop をセットした場合はキューの空きを待たずに終了する。
+    """
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for chunk in resp.iter_content(chunk_size=_CHUNK_SIZE):
+            if not put(chunk):
+                return
+    except Exception as exc:  # 受信エラーは消費側で再送出する
+        put(exc)
+        return
+    put(None)
+
+
+class _QueueReader(io.RawIOBase):
+    """プロデューサースレッドがキューに積んだバイト列を順に読み出すストリーム。"""
+
+    def __init__(self, chunks: queue.Queue):
+        self._chunks = chunks
+        self._buf = memoryview(b"")
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buf and not self._eof:
+            item = self._chunks.get()
+            if item is None:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                self._buf = memoryview(item)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+class _ZipMemberReader(io.RawIOBase):
+    """
+    ZIP の先頭メンバーをローカルファイルヘッダから読み取り、シークせずに逐次解凍するストリーム。
+
+    GDELT のエクスポートは deflate 圧縮の CSV 1 ファイルのみを含むため、
+    セントラルディレクトリ（ファイル末尾）を待たずに受信済みの部分から解凍できる。
+    解凍し終えた時点で CRC-32 を照合し、破損したデータは zipfile.BadZipFile として扱う。
+    """
+
+    _LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+    _DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+
+    def __init__(self, raw: io.RawIOBase):
+        header = self._read_exact(raw, self._LOCAL_HEADER.size)
+        signature, _, flags, method, _, _, crc, _, _, name_len, extra_len = self._LOCAL_HEADER.unpack(header)
+        if signature != 0x04034B50:
+            raise ValueError("Not a ZIP local file header")
+        if method != zipfile.ZIP_DEFLATED:
+            raise ValueError(f"Unsupported ZIP compression method: {method}")
+        name = self._read_exact(raw, name_len)
+        self.name = name.decode("utf-8" if flags & 0x800 else "cp437")
+        self._read_exact(raw, extra_len)
+        self._raw = raw
+        self._inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        # フラグ bit 3 が立っている場合、CRC はヘッダではなく圧縮データ直後のデータ記述子にある
+        self._expected_crc = None if flags & 0x08 else crc
+        self._crc = 0
+
+    @staticmethod
+    def _read_exact(raw: io.RawIOBase, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = raw.read(size - len(data))
+            if not chunk:
+                raise EOFError("Unexpected end of ZIP stream")
+            data += chunk
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._inflater.eof:
+            src = self._inflater.unconsumed_tail or self._raw.read(_CHUNK_SIZE)
+            if not src:
+                raise EOFError("Unexpected end of ZIP stream")
+            out = self._inflater.decompress(src, len(b))
+            self._crc = zlib.crc32(out, self._crc)
+            if self._inflater.eof:
+                self._verify_crc()
+            if out:
+                b[:len(out)] = out
+                return len(out)
+        return 0
+
+    def _verify_crc(self) -> None:
+        """解凍し終えたデータの CRC-32 を、ローカルヘッダまたはデータ記述子の値と照合する。"""
+        expected = self._expected_crc
+        if expected is None:
+            # データ記述子: [署名 (省略可)] CRC-32, 圧縮後サイズ, 圧縮前サイズ
+            tail = self._inflater.unused_data
+            while len(tail) < 8:
+                chunk = self._raw.read(8 - len(tail))
+                if not chunk:
+                    raise EOFError("Unexpected end of ZIP stream")
+                tail += chunk
+            offset = 4 if tail[:4] == self._DATA_DESCRIPTOR_SIGNATURE else 0
+            (expected,) = struct.unpack_from("<I", tail, offset)
+        if self._crc != expected:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for file {self.name!r}")
+
+
+def _to_numeric(column: pa.Array, target: pa.DataType) -> pa.Array:
+    """
+    文字列の列を target 型に変換する。
+
+    通常は Arrow の cast 1 回で済ませ、数値でないセルを含む場合のみ pandas の
+    to_numeric(errors="coerce") と同様に、変換できないセルを欠損値にする。
+    整数列では、整数でない値と範囲外の値も欠損値にする。
+    """
+    # 空セルは数値列では欠損値（CSV リーダーの既定の null 扱いと同じ）
+    column = pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
+    try:
+        return pc.cast(column, target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        values = pd.to_numeric(column.to_pandas(), errors="coerce")
+        if pa.types.is_integer(target):
+            info = np.iinfo(target.to_pandas_dtype())
+            values = values.where((values % 1 == 0) & values.between(info.min, info.max))
+        return pa.array(values, from_pandas=True).cast(target)
+
+
+def _convert_numeric_columns(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """文字列として読んだバッチの数値列を COLUMN_TYPES の型に変換する。"""
+    columns = [
+        _to_numeric(batch.column(name), COLUMN_TYPES[name]) if name in NUMERIC_COLUMNS else batch.column(name)
+        for name in USED_COLUMNS
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=_BATCH_SCHEMA)
+
+
+def _filter_conflict_events(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """物理的な紛争（QuadClass=4）または抗議デモ・暴動（EventRootCode=14）の行のみを残す。"""
+    return batch.filter(pc.or_kleene(
+        pc.equal(batch.column("QuadClass"), 4),
+        pc.equal(batch.column("EventRootCode"), 14),
+    ))
+
+
 def download_and_parse(url: str) -> pd.DataFrame:
-    """ZIP をメモリ上でダウンロード・解凍し DataFrame として返す。"""
-    logger.info("Downloading %s ...", url)
-    resp = requests.get(url, timeout=120)
-    resp.raise_for_status()
+    """
+    ZIP をストリーミングでダウンロード・解凍し DataFrame として返す。
 
-    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
-        csv_name = next(n for n in zf.namelist() if n.endswith(".CSV"))
-        logger.info("Extracting %s ...", csv_name)
-        with zf.open(csv_name) as f:
-            df = pd.read_csv(
-                f,
-                sep="\t",
-                header=None,
-                names=GDELT_COLUMNS,
-                low_memory=False,
+    受信はバックグラウンドスレッドで行い、メインスレッドは届いたチャンクから順に
+    解凍と CSV パースを進める（ネットワーク待ちと CPU 処理を重ね合わせる）。
+    紛争イベントのみをバッチ単位で Arrow 上で絞り込み、残った行だけを pandas に渡す。
+    """
+    logger.info("Downloading %s ...", url)
+    chunks = queue.Queue(maxsize=_PREFETCH_CHUNKS)
+    stop = threading.Event()
+    with _SESSION.get(url, stream=True, timeout=120) as resp:
+        resp.raise_for_status()
+        producer = threading.Thread(target=_stream_chunks, args=(resp, chunks, stop), daemon=True)
+        producer.start()
+        try:
+            member = _ZipMemberReader(_QueueReader(chunks))
+            if not member.name.endswith(".CSV"):
+                raise ValueError(f"Unexpected file in GDELT export: {member.name}")
+            logger.info("Extracting %s ...", member.name)
+            # 集計に使う 5 列のみをパースする（残り 53 列は実体化しない）
+            reader = pacsv.open_csv(
+                io.BufferedReader(member, buffer_size=_CHUNK_SIZE),
+                read_options=_CSV_READ_OPTIONS,
+                parse_options=_CSV_PARSE_OPTIONS,
+                convert_options=_CSV_CONVERT_OPTIONS,
+            )
+            tbl = pa.Table.from_batches(
+                [_filter_conflict_events(_convert_numeric_columns(batch)) for batch in reader],
+                schema=_BATCH_SCHEMA,
             )
+        finally:
+            stop.set()
+            producer.join()
+
+    df = tbl.to_pandas()
 
     logger.info("Loaded %d rows", len(df))
     return df
 
 
+def extract_keywords_from_url(url: str) -> list:
+    """トップニュースURLのパス部分からハイフン/スラッシュ区切りの単語を簡易抽出する。"""
+    if not url or not isinstance(url, str):
+        return []
+    # URLのパス部分を取得してトークンに分解
+    path = urlparse(url).path
+    tokens = [t.lower() for t in path.replace("/", "-").replace("_", "-").split("-") if len(t) >= 3]  # skip short noise words
+    return tokens
+
+
 def process(df: pd.DataFrame) -> dict:
     """DataFrame を国別に集計して紛争リスクスコア辞書を返す。"""
-    # 必要カラムのみ抽出
-    cols = ["Actor1Geo_CountryCode", "QuadClass", "EventRootCode", "GoldsteinScale", "SOURCEURL"]
-    df = df[cols].copy()
-
-    # 数値型を強制
-    df["QuadClass"] = pd.to_numeric(df["QuadClass"], errors="coerce")
-    df["EventRootCode"] = pd.to_numeric(df["EventRootCode"], errors="coerce")
-    df["GoldsteinScale"] = pd.to_numeric(df["GoldsteinScale"], errors="coerce")
+    # 入力フレームはコピーせず、使う列を NumPy 配列として取り出してフィルタを 1 つのマスクにまとめる
+    quad_class = df["QuadClass"].to_numpy()
+    event_root = df["EventRootCode"].to_numpy()
 
     # 物理的な紛争（QuadClass=4）または抗議デモ・暴動（EventRootCode=14）のみ残す
-    df = df[(df["QuadClass"] == 4) | (df["EventRootCode"] == 14)]
+    rows = np.flatnonzero((quad_class == 4) | (event_root == 14))
 
-    # 国コードが空の行を除外
-    df = df[df["Actor1Geo_CountryCode"].notna() & (df["Actor1Geo_CountryCode"].str.strip() != "")]
+    # FIPS → ISO3 変換とターゲット地域の絞り込み
+    # 2 文字の国コードを文字コードから 26×26 テーブルの添字に変換し、Python の辞書を引かずに一括で変換する
+    # （空・英大文字 2 文字でない・辞書にない・ターゲット外のコードは除外）
+    fips = np.char.strip(df["Actor1Geo_CountryCode"].to_numpy()[rows].astype("U4"))
+    chars = fips.view(np.uint32).reshape(-1, 4)
+    letters = chars[:, :2] - ord("A")  # 'A' 未満の文字は桁あふれして 26 以上になる
+    valid = (letters < 26).all(axis=1) & (chars[:, 2:] == 0).all(axis=1)
+    iso3_codes = np.where(valid, _FIPS_LUT[np.where(valid, letters[:, 0] * 26 + letters[:, 1], 0)], -1)
+    mask = iso3_codes >= 0
+    rows = rows[mask]
 
-    # FIPS → ISO3 変換（辞書にないコードは除外）
-    df["iso3"] = df["Actor1Geo_CountryCode"].str.strip().map(FIPS_TO_ISO3)
-    df = df[df["iso3"].notna()]
-
-    # ターゲット地域のみに絞り込む
-    df = df[df["iso3"].isin(TARGET_ISO3)]
+    iso3_idx = iso3_codes[mask].astype(np.intp)
 
     # BaseScore = abs(GoldsteinScale)
-    df["BaseScore"] = df["GoldsteinScale"].abs()
-
-    # 国ごとに最もBaseScoreが高い（深刻な）記事のURLを取得
-    df_valid = df.dropna(subset=["BaseScore", "SOURCEURL"])
-    top_news = (
-        df_valid.sort_values("BaseScore", ascending=False)
-        .groupby("iso3")["SOURCEURL"]
-        .first()
-    )
-
-    # EventRootCode の分布を国ごとに集計
-    event_code_dist = (
-        df.dropna(subset=["EventRootCode"])
-        .groupby("iso3")["EventRootCode"]
-        .value_counts()
-    )
-
-    # トップニュースURLからキーワードを簡易抽出
-    def extract_keywords_from_url(url: str) -> list:
-        """URLのパス部分からハイフン/スラッシュ区切りの単語を抽出する。"""
-        if not url or not isinstance(url, str):
-            return []
-        # URLのパス部分を取得してトークンに分解
-        from urllib.parse import urlparse
-        path = urlparse(url).path
-        tokens = [t.lower() for t in path.replace("/", "-").replace("_", "-").split("-") if len(t) >= 3]  # skip short noise words
-        return tokens
+    base_score = np.abs(df["GoldsteinScale"].to_numpy()[rows].astype(np.float64))
+    source_url = df["SOURCEURL"].to_numpy()[rows]
+    # top_news の候補は BaseScore と URL が揃った行のみ（それ以外は番兵 -1 で候補から外す）
+    top_score = np.where(pd.notna(source_url) & ~np.isnan(base_score), base_score, -1.0)
 
     # 集計: Risk Score = sum(BaseScore) / 10
-    agg = df.groupby("iso3").agg(
-        risk_score=("BaseScore", lambda x: x.sum() / 10),
-        count=("BaseScore", "size"),
-    )
+    # 国コードは ISO3_LIST 上の小さな整数なので、ハッシュ groupby ではなく bincount で合算する
+    sums = np.bincount(iso3_idx, weights=np.nan_to_num(base_score), minlength=len(ISO3_LIST))
+    counts = np.bincount(iso3_idx, minlength=len(ISO3_LIST))
 
-    agg["top_news"] = top_news
-    agg["top_news"] = agg["top_news"].fillna("")
-
-    # 足切り: Risk Score < 2.0 の国を除外
-    agg = agg[agg["risk_score"] >= 2.0]
+    # 国ごとに最もBaseScoreが高い（深刻な）記事のURLを取得
+    # (国, BaseScore 降順) の安定ソート 1 回で各国の先頭行を求める（同点は先に出現した行）
+    order = np.lexsort((-top_score, iso3_idx))
+    top_codes, first = np.unique(iso3_idx[order], return_index=True)
+    top_rows = order[first]
+    top_news = np.full(len(ISO3_LIST), "", dtype=object)
+    top_news[top_codes] = np.where(top_score[top_rows] >= 0, source_url[top_rows], "")
+
+    # EventRootCode の分布を国ごとに集計: (国, コード) の組を数え、国内では件数の多い順に並べる
+    event_root = event_root[rows]
+    has_code = ~pd.isna(event_root)
+    pairs, pair_counts = np.unique(
+        np.stack([iso3_idx[has_code], event_root[has_code].astype(np.int64)]),
+        axis=1,
+        return_counts=True,
+    )
+    order = np.lexsort((pairs[1], -pair_counts, pairs[0]))
+    event_codes = {}
+    for i, code, cnt in zip(pairs[0][order].tolist(), pairs[1][order].tolist(), pair_counts[order].tolist()):
+        event_codes.setdefault(i, {})[str(code)] = cnt
 
+    # 足切り: Risk Score < 2.0 の国を除外し、残った国（高々 ISO3_LIST の件数）だけ辞書に詰める
+    risk_scores = sums / 10
     result = {}
-    for iso3, row in agg.iterrows():
-        # event_codes: EventRootCode の分布を辞書化
-        codes = {}
-        if iso3 in event_code_dist.index.get_level_values(0):
-            series = event_code_dist[iso3]
-            for code, cnt in series.items():
-                codes[str(int(code))] = int(cnt)  # float→int→str since pandas stores numeric as float
-
-        # keywords: トップニュースURLから抽出
-        keywords = extract_keywords_from_url(str(row["top_news"]))
-
-        result[iso3] = {
-            "risk_score": round(float(row["risk_score"]), 4),
-            "count": int(row["count"]),
-            "top_news": str(row["top_news"]),
-            "event_codes": codes,
-            "keywords": keywords,
+    for i in np.flatnonzero(risk_scores >= 2.0).tolist():
+        result[ISO3_LIST[i]] = {
+            "risk_score": round(float(risk_scores[i]), 4),
+            "count": int(counts[i]),
+            "top_news": str(top_news[i]),
+            "event_codes": event_codes.get(i, {}),
+            # keywords: トップニュースURLから抽出
+            "keywords": extract_keywords_from_url(top_news[i]),
         }
 
     logger.info("Aggregated %d countries", len(result))
@@ -250,8 +486,9 @@ def process(df: pd.DataFrame) -> dict:
 def save(data: dict, path: Path) -> None:
     """JSON を指定パスに保存する。ディレクトリが存在しない場合は作成する。"""
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # orjson は常に UTF-8（非 ASCII をエスケープしない）で bytes を返す
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
     logger.info("Saved to %s", path)
 
 
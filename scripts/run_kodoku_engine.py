@@ -4,12 +4,35 @@ Project KODOKU - Global Supply-Chain Survival Probability Simulator
 
 GDELT の紛争データとチョークポイントの地理情報を組み合わせ、
 主要海運ルート（シーレーン）の封鎖確率・生存確率を数学的に算出する。
+
+多数の国の補正係数を求める場合は、1 国ずつの compute_context_multiplier ではなく
+一括版の compute_context_multiplier_batch を使うこと。
 """
 
 import json
 import logging
 import math
+import re
+import sys
+from collections import namedtuple
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+
+import numpy as np
+import orjson
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # numba は任意依存。未インストール時は NumPy 実装で計算する
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """numba がない環境向けの no-op デコレータ（関数をそのまま返す）。"""
+        return lambda f: f
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 logger = logging.getLogger(__name__)
@@ -41,21 +64,37 @@ CHOKE_POINT_MAP = {cp["id"]: cp for cp in CHOKE_POINTS}
 # ---------------------------------------------------------------------------
 # 過去に実際にシーレーンが脅かされた事例の「指紋（Fingerprint）」
 # ---------------------------------------------------------------------------
-HISTORICAL_CRISES = {
-    "suez_blockade": {
-        "keywords": ["canal", "strait", "shipping", "vessel", "tanker", "blocked", "closed", "attack", "missile", "drone"],
-        "target_event_codes": [19, 20],  # 19: Military Use of Force, 20: Unconventional Mass Violence
-        "weight": 2.0,  # 類似した場合の重み付け
-    },
-    "internal_unrest": {
-        "keywords": ["protest", "election", "parliament", "demonstration", "police", "internal"],
-        "target_event_codes": [14],  # 14: Protests
-        "weight": 0.1,  # 海運リスクとしては無視する（ペナルティ係数）
-    },
-}
+Crisis = namedtuple("Crisis", ["keywords", "target_event_codes", "weight"])
+
+# 読み取り専用の定数表なので MappingProxyType で包み、重みは属性 (.weight) で参照する
+HISTORICAL_CRISES = MappingProxyType({
+    "suez_blockade": Crisis(
+        keywords=("canal", "strait", "shipping", "vessel", "tanker", "blocked", "closed", "attack", "missile", "drone"),
+        target_event_codes=(19, 20),  # 19: Military Use of Force, 20: Unconventional Mass Violence
+        weight=2.0,  # 類似した場合の重み付け
+    ),
+    "internal_unrest": Crisis(
+        keywords=("protest", "election", "parliament", "demonstration", "police", "internal"),
+        target_event_codes=(14,),  # 14: Protests
+        weight=0.1,  # 海運リスクとしては無視する（ペナルティ係数）
+    ),
+})
 
 # 海運関連キーワード（コンテキスト検証用）
-MARITIME_KEYWORDS = {"canal", "strait", "port", "shipping", "vessel", "tanker", "blocked", "closed", "attack", "missile", "drone"}
+MARITIME_KEYWORDS = frozenset({"canal", "strait", "port", "shipping", "vessel", "tanker", "blocked", "closed", "attack", "missile", "drone"})
+
+# top_news などの自由文から海運キーワードを 1 パスで探す走査器（全キーワードの選択を 1 つの正規表現にまとめる）。
+# 前後が英数字でない位置のみ一致させ、"portal" や "passport" のような部分一致は拾わない。
+_MARITIME_RE = re.compile(
+    r"(?<![a-z0-9])(?:" + "|".join(map(re.escape, sorted(MARITIME_KEYWORDS))) + r")(?![a-z0-9])"
+)
+
+
+def text_has_maritime(text: str) -> bool:
+    """自由文（ニュース URL など）に海運キーワードが 1 語でも含まれるかを返す。最初の一致で打ち切る。"""
+    if not text or not isinstance(text, str):
+        return False
+    return _MARITIME_RE.search(text.lower()) is not None
 
 # ---------------------------------------------------------------------------
 # 海運ルート定義
@@ -94,6 +133,16 @@ ROUTES = [
     },
 ]
 
+# チョークポイント ID → CHOKE_POINTS 上の添字と、各ルートが通過するチョークポイントの添字配列
+CP_ID_TO_IDX = {cp["id"]: i for i, cp in enumerate(CHOKE_POINTS)}
+ROUTE_CP_IDX = [np.array([CP_ID_TO_IDX[cp_id] for cp_id in route["chokepoints"]], dtype=np.intp) for route in ROUTES]
+
+# チョークポイントの ID・名称・座標を CHOKE_POINTS と同じ並びの列として展開しておく（計算中は辞書を引かない）
+_CP_IDS = tuple(cp["id"] for cp in CHOKE_POINTS)
+_CP_NAMES = tuple(cp["name"] for cp in CHOKE_POINTS)
+_CP_LONS = np.array([cp["coordinates"][0] for cp in CHOKE_POINTS], dtype=np.float64)
+_CP_LATS = np.array([cp["coordinates"][1] for cp in CHOKE_POINTS], dtype=np.float64)
+
 # ---------------------------------------------------------------------------
 # 国の中心座標 (ISO3 → [longitude, latitude])
 # daily_risk_score.json に含まれうるすべてのターゲット国の概算座標
@@ -125,71 +174,310 @@ COUNTRY_CENTROIDS = {
     "URY": [-55.77, -32.52], "GUY": [-58.93, 4.86], "SUR": [-56.03, 3.92],
 }
 
+# 中心座標を SoA 形式の配列 (度単位) として import 時に一度だけ展開しておく
+_COUNTRY_KEYS = tuple(COUNTRY_CENTROIDS)
+_LON_DEG = np.array([COUNTRY_CENTROIDS[k][0] for k in _COUNTRY_KEYS], dtype=np.float64)
+_LAT_DEG = np.array([COUNTRY_CENTROIDS[k][1] for k in _COUNTRY_KEYS], dtype=np.float64)
+
 # ---------------------------------------------------------------------------
 # 距離計算パラメータ
 # ---------------------------------------------------------------------------
+EARTH_RADIUS_KM = 6371.0  # 地球の半径 (km)
 INFLUENCE_RADIUS_KM = 1500  # チョークポイントへの影響半径 (km)
 NORMALIZATION_DIVISOR = 30.0  # 危機スコアを確率に正規化するための除数
 
 
-def haversine_km(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
-    """2点間の大圏距離を km で返す (Haversine の公式)。"""
-    R = 6371.0  # 地球の半径 (km)
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
+def haversine_km(
+    lon1: float, lat1: float, lon2: float, lat2: float,
+    _radians=math.radians, _sin=math.sin, _cos=math.cos, _asin=math.asin, _sqrt=math.sqrt,
+) -> float:
+    """
+    2点間の大圏距離を km で返す (Haversine の公式)。
+
+    math の関数はデフォルト引数でローカルに束縛し、呼び出しごとのグローバル/属性参照を省く。
+    """
+    phi1 = _radians(lat1)
+    phi2 = _radians(lat2)
+    sin_dphi = _sin(_radians(lat2 - lat1) / 2)
+    sin_dlambda = _sin(_radians(lon2 - lon1) / 2)
+
+    a = sin_dphi * sin_dphi + _cos(phi1) * _cos(phi2) * sin_dlambda * sin_dlambda
+    return 2 * EARTH_RADIUS_KM * _asin(_sqrt(a))
+
+
+def haversine_km_vec(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """
+    haversine_km の NumPy 版。度単位の配列を受け取り、ブロードキャストした形状で距離 (km) を返す。
 
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+    1 点同士の計算には NumPy の呼び出しコストがかからない haversine_km を使う。
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(np.subtract(lon2, lon1)) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _decay_matrix_numpy(cp_lon: np.ndarray, cp_lat: np.ndarray) -> np.ndarray:
+    """
+    (チョークポイント数, 国数) の距離減衰行列を NumPy で算出する。
+
+    cp_lon / cp_lat は度単位。影響半径内のみ線形減衰させる（半径外は 0）。
+    """
+    dist_km = haversine_km_vec(cp_lon[:, None], cp_lat[:, None], _LON_DEG, _LAT_DEG)
+    return np.clip((INFLUENCE_RADIUS_KM - dist_km) / INFLUENCE_RADIUS_KM, 0.0, None)
+
+
+@njit(cache=True)
+def _disruption_kernel_numba(indptr, indices, weights, scores, mults):
+    """
+    補正後リスク (score × multiplier) を減衰率で重み付けし、チョークポイントごとに合算する。
+
+    各チョークポイントについて、影響半径内の国 (CSR 形式の近傍リスト) だけを走査する。
+    """
+    out = np.zeros(indptr.size - 1)
+    for i in range(indptr.size - 1):
+        acc = 0.0
+        for k in range(indptr[i], indptr[i + 1]):
+            j = indices[k]
+            acc += scores[j] * mults[j] * weights[k]
+        out[i] = acc
+    return out
+
+
+def _disruption_kernel_numpy(
+    indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray, scores: np.ndarray, mults: np.ndarray,
+) -> np.ndarray:
+    """
+    _disruption_kernel_numba と同じ合算を NumPy で行う。
+
+    近傍リストの要素だけを添字で取り出して重み付けし、チョークポイント (行) ごとに bincount で合算する。
+    掛け算・足し算の順序は numba 版と同じなので、どちらの経路でも結果は一致する。
+    """
+    rows = np.repeat(np.arange(indptr.size - 1), np.diff(indptr))
+    return np.bincount(rows, weights=scores[indices] * mults[indices] * weights, minlength=indptr.size - 1)
+
+
+# チョークポイントと国の座標はどちらも静的なので、距離減衰行列は import 時に一度だけ計算する。
+# 実行時に変わるのは risk_data だけで、危機スコアは下の近傍リストに沿って合算する。
+# 8×59 程度の小さな行列なので NumPy で十分速く、numba の有無で値が変わることもない。
+_DECAY = _decay_matrix_numpy(_CP_LONS, _CP_LATS)
+
+# 影響半径内 (減衰率 > 0) に入る国はチョークポイントごとに数か国しかないので、
+# その添字と減衰率を CSR 形式 (行 = チョークポイント) の近傍リストとしても持っておく
+_NEIGHBOR_PTR = np.concatenate(([0], np.cumsum(np.count_nonzero(_DECAY, axis=1)))).astype(np.intp)
+_NEIGHBOR_IDX = np.nonzero(_DECAY)[1].astype(np.intp)
+_NEIGHBOR_DECAY = _DECAY[_DECAY > 0]
+
+# データのある国がこれより少ないときは、JIT カーネルを呼ぶより NumPy 版の方が速い
+_NUMBA_MIN_COUNTRIES = 16
+
+
+def _disruption_kernel(scores: np.ndarray, mults: np.ndarray) -> np.ndarray:
+    """
+    データのある国の数に応じて numba / NumPy のカーネルを選ぶ。
+
+    どちらも影響半径内の国 (近傍リスト) だけを合算するので、numba のない環境でも同じ距離ゲートが効く。
+    """
+    kernel = (
+        _disruption_kernel_numba
+        if HAS_NUMBA and np.count_nonzero(scores) >= _NUMBA_MIN_COUNTRIES
+        else _disruption_kernel_numpy
+    )
+    return kernel(_NEIGHBOR_PTR, _NEIGHBOR_IDX, _NEIGHBOR_DECAY, scores, mults)
 
 
 def load_risk_data(path: Path) -> dict:
     """daily_risk_score.json を読み込む。"""
     logger.info("Loading risk data from %s", path)
     with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+        raw = json.load(f)
+
+    # 国コードとイベントコードのキーは intern しておき、ソース中のリテラル ("14" など) や
+    # COUNTRY_CENTROIDS のキーと同じ文字列オブジェクトで辞書を引けるようにする
+    data = {}
+    for iso3, info in raw.items():
+        event_codes = info.get("event_codes")
+        if event_codes:
+            info["event_codes"] = {sys.intern(code): count for code, count in event_codes.items()}
+        data[sys.intern(iso3)] = info
     logger.info("Loaded risk data for %d countries", len(data))
     return data
 
 
-def compute_context_multiplier(country_info: dict) -> float:
+# CAMEO ルートコード (01〜20) の件数を密な行列で持つ。列 j がコード j+1 に対応する
+N_EVENT_CODES = 20
+_EVENT_CODE_COL = {str(code): code - 1 for code in range(1, N_EVENT_CODES + 1)}
+_PROTEST_COL = _EVENT_CODE_COL["14"]                                # 抗議デモ
+_MILITARY_COLS = [_EVENT_CODE_COL["19"], _EVENT_CODE_COL["20"]]     # 戦闘・大量暴力
+
+
+def _event_count_matrix(countries: Sequence[dict]) -> tuple:
     """
-    コンテキスト検証 (Context Verification):
-    過去の海運危機パターンとの類似性を検証し、リスク補正係数を返す。
+    国データの並びから (国数, 20) の int32 件数行列と、国ごとの総イベント数を作る。
 
-    - 国内デモが大半で海運関連キーワードがない場合 → 0.1 (1/10 に減衰)
-    - 軍事行動＋海運キーワードがある場合 → 2.0 (増幅)
-    - どちらにも該当しない場合 → 1.0 (そのまま)
+    01〜20 以外のキーは行列には入らないが、総イベント数には含める（割合の分母は event_codes 全体の合計）。
     """
-    event_codes = country_info.get("event_codes", {})
-    keywords = [k.lower() for k in country_info.get("keywords", [])]
-    keywords_set = set(keywords)
+    counts = np.zeros((len(countries), N_EVENT_CODES), dtype=np.int32)
+    totals = np.zeros(len(countries))
+    for j, info in enumerate(countries):
+        event_codes = info.get("event_codes")
+        if not event_codes:
+            continue
+        totals[j] = sum(event_codes.values())
+        for code, count in event_codes.items():
+            col = _EVENT_CODE_COL.get(code)
+            if col is not None:
+                counts[j, col] = count
+    return counts, totals
 
-    if not event_codes:
-        return 1.0
 
+def _classify_events(event_codes: dict) -> tuple:
+    """
+    event_codes から (抗議デモの割合, 軍事行動の割合, 総イベント数) を求める。
+
+    抗議デモは CAMEO ルートコード 14、軍事行動は 19 (戦闘) と 20 (大量暴力)。総数 0 の場合は割合も 0。
+    """
     total_events = sum(event_codes.values())
     if total_events == 0:
-        return 1.0
-
+        return 0.0, 0.0, 0
     protest_count = event_codes.get("14", 0)
     military_count = event_codes.get("19", 0) + event_codes.get("20", 0)
+    return protest_count / total_events, military_count / total_events, total_events
 
-    has_maritime_keywords = bool(keywords_set & MARITIME_KEYWORDS)
 
+def _has_maritime_keywords(country_info: dict) -> bool:
+    """海運キーワードの有無。keywords リストで判定し、keywords がなければ top_news を走査する。"""
+    keywords = country_info.get("keywords")
+    if keywords is not None:
+        # 中間の set を作らず、最初に一致したキーワードで打ち切る
+        return not MARITIME_KEYWORDS.isdisjoint(k.lower() for k in keywords)
+    # keywords を持たないデータはトップニュースの本文（URL）を直接走査する
+    return text_has_maritime(country_info.get("top_news", ""))
+
+
+def _context_multiplier_impl(share_protest: float, share_military: float, has_maritime: bool) -> float:
+    """
+    1 国分の補正係数を決める分岐本体（_context_multipliers のスカラー版）。
+
+    引数・戻り値とも組み込み型だけに限定しているので、mypyc などでそのままコンパイルできる。
+    """
     # パターン1: 大半がプロテスト (>50%) かつ海運キーワードなし → 国内デモ
-    if protest_count > total_events * 0.5 and not has_maritime_keywords:
-        return HISTORICAL_CRISES["internal_unrest"]["weight"]  # 0.1
+    if share_protest > 0.5 and not has_maritime:
+        return HISTORICAL_CRISES["internal_unrest"].weight  # 0.1
 
     # パターン2: 軍事行動あり かつ海運キーワードあり → 本物の海運危機
-    if military_count > 0 and has_maritime_keywords:
-        return HISTORICAL_CRISES["suez_blockade"]["weight"]  # 2.0
+    if share_military > 0 and has_maritime:
+        return HISTORICAL_CRISES["suez_blockade"].weight  # 2.0
 
     return 1.0
 
 
+def _context_multipliers(
+    share_protest: np.ndarray, share_military: np.ndarray, has_maritime: np.ndarray,
+) -> np.ndarray:
+    """_classify_events の割合と海運キーワードの有無から、全ての国の補正係数を一括で決める。"""
+    multipliers = np.ones(len(share_protest))
+    # パターン2: 軍事行動あり かつ海運キーワードあり → 本物の海運危機
+    multipliers[(share_military > 0) & has_maritime] = HISTORICAL_CRISES["suez_blockade"].weight  # 2.0
+    # パターン1: 大半がプロテスト (>50%) かつ海運キーワードなし → 国内デモ
+    # （パターン 2 とは海運キーワードの有無で排他なので、代入順は結果に影響しない）
+    multipliers[(share_protest > 0.5) & ~has_maritime] = HISTORICAL_CRISES["internal_unrest"].weight  # 0.1
+    return multipliers
+
+
+def _context_columns(countries: Sequence[dict]) -> tuple:
+    """
+    国データの並びから (抗議デモの割合, 軍事行動の割合, 海運キーワードの有無) の配列を作る。
+
+    割合は件数行列の列演算でまとめて求め、海運キーワードはイベントのある国についてのみ判定する。
+    """
+    counts, totals = _event_count_matrix(countries)
+    # イベントのない国はどのパターンにも該当しない（割合 0・補正係数 1.0）
+    has_events = totals != 0
+    share_protest = np.divide(counts[:, _PROTEST_COL], totals, out=np.zeros(len(totals)), where=has_events)
+    share_military = np.divide(
+        counts[:, _MILITARY_COLS].sum(axis=1), totals, out=np.zeros(len(totals)), where=has_events,
+    )
+    has_maritime = np.fromiter(
+        (bool(flag) and _has_maritime_keywords(info) for flag, info in zip(has_events, countries)),
+        dtype=bool,
+        count=len(countries),
+    )
+    return share_protest, share_military, has_maritime
+
+
+def compute_context_multiplier_batch(countries: Sequence[dict]) -> np.ndarray:
+    """複数の国の補正係数を一括で算出する（compute_context_multiplier の配列版）。"""
+    return _context_multipliers(*_context_columns(countries))
+
+
+def _context_key(country_info: dict) -> tuple:
+    """補正係数の判定に使う項目だけを取り出した、ハッシュ可能なキーを返す。"""
+    keywords = country_info.get("keywords")
+    return (
+        tuple(sorted((country_info.get("event_codes") or {}).items())),
+        None if keywords is None else tuple(keywords),
+        # top_news は keywords がないときだけ判定に使う
+        country_info.get("top_news", "") if keywords is None else "",
+    )
+
+
+@lru_cache(maxsize=4096)
+def _context_multiplier_cached(key: tuple) -> float:
+    """_context_key のキーから補正係数を求める。同じ内容の国データは 2 回目以降キャッシュから返す。"""
+    event_items, keywords, top_news = key
+    share_protest, share_military, total_events = _classify_events(dict(event_items))
+    if total_events == 0:
+        return 1.0
+    has_maritime = _has_maritime_keywords({"keywords": keywords, "top_news": top_news})
+    # 1 国分なので配列を作らず、スカラーの分岐本体で判定する
+    return _context_multiplier_impl(share_protest, share_military, has_maritime)
+
+
+def compute_context_multiplier(country_info: dict) -> float:
+    """
+    コンテキスト検証 (Context Verification):
+    過去の海運危機パターンとの類似性を検証し、リスク補正係数を返す。
+
+    - 国内デモが大半で海運関連キーワードがない場合 → 0.1 (1/10 に減衰)
+    - 軍事行動＋海運キーワードがある場合 → 2.0 (増幅)
+    - どちらにも該当しない場合 → 1.0 (そのまま)
+
+    海運キーワードは keywords リストで判定し、keywords がなければ top_news を走査する。
+    """
+    return _context_multiplier_cached(_context_key(country_info))
+
+
+@dataclass(slots=True)
+class _RiskArrays:
+    """
+    risk_data を国方向の SoA（列ごとの配列）に詰め直したもの。
+
+    各配列は _COUNTRY_KEYS の並び（_DECAY の列と同じ）に揃えてあり、データのない国はスコア 0・補正係数 1.0。
+    並びが _DECAY と一致していることは _pack_risk_data だけが保証するので、外部から組み立てて渡さないこと。
+    """
+    scores: np.ndarray
+    multipliers: np.ndarray
+
+
+def _pack_risk_data(risk_data: dict) -> _RiskArrays:
+    """
+    risk_data (国 → 辞書) を _RiskArrays に変換する。
+
+    event_codes の集計と海運キーワードの判定は国ごとに一度だけ行い、補正係数は全ての国をまとめて算出する。
+    """
+    scores = np.fromiter(
+        (risk_data[iso3]["risk_score"] if iso3 in risk_data else 0.0 for iso3 in _COUNTRY_KEYS),
+        dtype=np.float64,
+        count=len(_COUNTRY_KEYS),
+    )
+    multipliers = compute_context_multiplier_batch([risk_data.get(iso3, {}) for iso3 in _COUNTRY_KEYS])
+    return _RiskArrays(scores, multipliers)
+
+
 def compute_chokepoint_disruption(risk_data: dict) -> dict:
     """
     各チョークポイントの封鎖確率 (Disruption Risk %) を算出する。
@@ -199,36 +487,25 @@ def compute_chokepoint_disruption(risk_data: dict) -> dict:
       2. コンテキスト検証: 過去の海運危機パターンとの類似性で補正。
       3. 補正後リスクで封鎖確率を算出。
     """
-    results = {}
-
-    for cp in CHOKE_POINTS:
-        cp_lon, cp_lat = cp["coordinates"]
-        crisis_score = 0.0
-
-        for iso3, country_info in risk_data.items():
-            centroid = COUNTRY_CENTROIDS.get(iso3)
-            if centroid is None:
-                continue
+    # 国ごとのスコアと補正係数を _DECAY の列と同じ並びの配列に詰め直す
+    packed = _pack_risk_data(risk_data)
 
-            c_lon, c_lat = centroid
-            dist_km = haversine_km(cp_lon, cp_lat, c_lon, c_lat)
-
-            if dist_km < INFLUENCE_RADIUS_KM:
-                decay = (INFLUENCE_RADIUS_KM - dist_km) / INFLUENCE_RADIUS_KM
-                context_multiplier = compute_context_multiplier(country_info)
-                crisis_score += country_info["risk_score"] * decay * context_multiplier
+    # 影響半径内のみ線形減衰させた補正後リスクをチョークポイントごとに合算する
+    crisis_scores = _disruption_kernel(packed.scores, packed.multipliers)
 
+    results = {}
+    for cp_id, cp_name, crisis_score in zip(_CP_IDS, _CP_NAMES, crisis_scores.tolist()):
         disruption_pct = min(max(crisis_score / NORMALIZATION_DIVISOR * 100, 0.0), 100.0)
         disruption_pct = round(disruption_pct, 1)
 
-        results[cp["id"]] = {
-            "name": cp["name"],
+        results[cp_id] = {
+            "name": cp_name,
             "disruption_risk": disruption_pct,
             "crisis_score_raw": round(crisis_score, 4),
         }
         logger.info(
             "  %s: crisis_score=%.4f  disruption_risk=%.1f%%",
-            cp["name"], crisis_score, disruption_pct,
+            cp_name, crisis_score, disruption_pct,
         )
 
     return results
@@ -243,19 +520,24 @@ def compute_route_survival(chokepoint_risks: dict) -> list:
     """
     route_results = []
 
-    for route in ROUTES:
-        cp_risks = []
-        for cp_id in route["chokepoints"]:
-            cp_data = chokepoint_risks.get(cp_id)
-            if cp_data:
-                cp_risks.append((cp_id, cp_data["name"], cp_data["disruption_risk"]))
+    # 封鎖確率を CHOKE_POINTS の並びの配列に詰めておく（データのないチョークポイントは NaN）
+    disruption = np.array([
+        chokepoint_risks[cp["id"]]["disruption_risk"] if chokepoint_risks.get(cp["id"]) else np.nan
+        for cp in CHOKE_POINTS
+    ])
 
-        if not cp_risks:
+    for route, route_idx in zip(ROUTES, ROUTE_CP_IDX):
+        route_idx = route_idx[~np.isnan(disruption[route_idx])]
+        if route_idx.size == 0:
             continue
 
+        cp_risks = [
+            (CHOKE_POINTS[i]["id"], chokepoint_risks[CHOKE_POINTS[i]["id"]]["name"], disruption[i].item())
+            for i in route_idx
+        ]
+
         # 最もリスクの高いチョークポイント (Critical Node)
-        critical = max(cp_risks, key=lambda x: x[2])
-        critical_id, critical_name, max_disruption = critical
+        critical_id, critical_name, max_disruption = cp_risks[int(disruption[route_idx].argmax())]
 
         survival_rate = round(100.0 - max_disruption, 1)
 
@@ -320,8 +602,9 @@ def save_report(route_results: list, chokepoint_risks: dict, path: Path) -> None
     }
 
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(report, f, ensure_ascii=False, indent=2)
+    # orjson は常に UTF-8（非 ASCII をエスケープしない）で bytes を返す
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
     logger.info("Report saved to %s", path)
 
 
@@ -1,27 +1,19 @@
 """Tests for scripts/fetch_gdelt.py – process() function."""
 
-import sys
-from pathlib import Path
+import io
+import zipfile
+import zlib
 
 import pandas as pd
 import pytest
 
-# Ensure scripts/ is importable
-sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
-
-from fetch_gdelt import TARGET_ISO3, process
+import fetch_gdelt
+from fetch_gdelt import GDELT_COLUMNS, TARGET_ISO3, USED_COLUMNS, download_and_parse, process
 
 
 def _make_df(rows):
     """Helper to build a minimal DataFrame that process() expects."""
-    cols = [
-        "Actor1Geo_CountryCode",
-        "QuadClass",
-        "EventRootCode",
-        "GoldsteinScale",
-        "SOURCEURL",
-    ]
-    return pd.DataFrame(rows, columns=cols)
+    return pd.DataFrame(rows, columns=USED_COLUMNS)
 
 
 # ---------- TARGET_ISO3 ----------
@@ -216,3 +208,148 @@ def test_keywords_extracted_from_url():
     assert isinstance(kw, list)
     assert "missile" in kw
     assert "tanker" in kw
+
+
+# ---------- download_and_parse ----------
+
+class _FakeResponse:
+    """Minimal stand-in for a streamed requests.Response."""
+
+    def __init__(self, body, chunk_size):
+        self._body = body
+        self._chunk_size = chunk_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self._body), self._chunk_size):
+            yield self._body[i:i + self._chunk_size]
+
+
+class _UnseekableBuffer(io.RawIOBase):
+    """Write-only sink that makes zipfile emit a data descriptor after the member."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+def _make_export_zip(rows, streamed=False):
+    """Build a GDELT-style export zip from (country, quad, root, goldstein, url) tuples."""
+    lines = []
+    for country, quad, root, goldstein, url in rows:
+        fields = dict(zip(USED_COLUMNS, (country, quad, root, goldstein, url)))
+        lines.append("\t".join(str(fields.get(c, "")) for c in GDELT_COLUMNS))
+    buf = _UnseekableBuffer() if streamed else io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("20240101000000.export.CSV", "\n".join(lines) + "\n")
+    return bytes(buf.data) if streamed else buf.getvalue()
+
+
+def test_download_and_parse_streams_and_prefilters(monkeypatch):
+    """Only conflict rows and the five used columns survive, even with tiny chunks."""
+    body = _make_export_zip([
+        ("EG", 4, 19, -10.0, "http://example.com/a"),
+        ("EG", 1, 1, 3.0, "http://example.com/b"),
+        ("IZ", 1, 14, -6.5, "http://example.com/c"),
+    ])
+    monkeypatch.setattr(fetch_gdelt._SESSION, "get", lambda *a, **kw: _FakeResponse(body, 7))
+
+    df = download_and_parse("http://example.com/20240101000000.export.CSV.zip")
+    assert list(df.columns) == USED_COLUMNS
+    assert df["SOURCEURL"].tolist() == ["http://example.com/a", "http://example.com/c"]
+
+
+def test_download_and_parse_keeps_goldstein_precision(monkeypatch):
+    """Goldstein weights such as -7.2 must survive parsing exactly so the 2.0 cutoff is not missed."""
+    body = _make_export_zip([
+        ("EG", 4, 15, -7.2, "http://example.com/a"),
+        ("EG", 4, 18, -2.8, "http://example.com/b"),
+        ("EG", 4, 19, -10.0, "http://example.com/c"),
+    ])
+    monkeypatch.setattr(fetch_gdelt._SESSION, "get", lambda *a, **kw: _FakeResponse(body, 64))
+
+    result = process(download_and_parse("http://example.com/20240101000000.export.CSV.zip"))
+    assert result["EGY"]["risk_score"] == 2.0
+
+
+def test_download_and_parse_tolerates_malformed_numeric_cells(monkeypatch):
+    """A non-numeric cell becomes missing (like pd.to_numeric(errors="coerce")) instead of aborting."""
+    body = _make_export_zip([
+        ("EG", 4, 19, -10.0, "http://example.com/a"),
+        ("EG", "x", 14, -6.5, "http://example.com/b"),   # bad QuadClass, kept via EventRootCode=14
+        ("IZ", 4, "1.0", "n/a", "http://example.com/c"),  # float-formatted root code, bad Goldstein
+        ("IZ", 1, "?", 2.0, "http://example.com/d"),      # bad root code, not a conflict row
+    ])
+    monkeypatch.setattr(fetch_gdelt._SESSION, "get", lambda *a, **kw: _FakeResponse(body, 64))
+
+    df = download_and_parse("http://example.com/20240101000000.export.CSV.zip")
+    assert df["SOURCEURL"].tolist() == ["http://example.com/a", "http://example.com/b", "http://example.com/c"]
+    assert df["QuadClass"].isna().tolist() == [False, True, False]
+    assert df["EventRootCode"].tolist() == [19, 14, 1]
+    assert df["GoldsteinScale"].isna().tolist() == [False, False, True]
+
+
+def test_download_and_parse_reads_data_descriptor(monkeypatch):
+    """Zips written to a stream keep the CRC in a trailing data descriptor."""
+    body = _make_export_zip([("EG", 4, 19, -10.0, "http://example.com/a")] * 10, streamed=True)
+    assert body[6] & 0x08  # general-purpose flag bit 3
+    monkeypatch.setattr(fetch_gdelt._SESSION, "get", lambda *a, **kw: _FakeResponse(body, 5))
+
+    df = download_and_parse("http://example.com/20240101000000.export.CSV.zip")
+    assert len(df) == 10
+
+
+@pytest.mark.parametrize("streamed", [False, True], ids=["header_crc", "data_descriptor"])
+def test_download_and_parse_corrupted_body(monkeypatch, streamed):
+    """A bit flip that still inflates cleanly must be caught by the CRC-32 check."""
+    rows = [("EG", 4, 19, -10.0, f"http://example.com/{i}") for i in range(50)]
+    body = _make_export_zip(rows, streamed=streamed)
+    start = 30 + len("20240101000000.export.CSV")
+    compressed_size = zipfile.ZipFile(io.BytesIO(body)).infolist()[0].compress_size
+    original = zlib.decompress(body[start:start + compressed_size], -zlib.MAX_WBITS)
+
+    # Pick the first single-bit flip that still yields a valid deflate stream with different content
+    for pos in range(start, start + compressed_size):
+        for bit in range(8):
+            corrupted = bytearray(body)
+            corrupted[pos] ^= 1 << bit
+            try:
+                inflated = zlib.decompress(bytes(corrupted[start:start + compressed_size]), -zlib.MAX_WBITS)
+            except zlib.error:
+                continue
+            if inflated != original:
+                break
+        else:
+            continue
+        break
+    else:
+        pytest.fail("no silently-inflating bit flip found")
+
+    monkeypatch.setattr(fetch_gdelt._SESSION, "get", lambda *a, **kw: _FakeResponse(bytes(corrupted), 64))
+    with pytest.raises(zipfile.BadZipFile):
+        download_and_parse("http://example.com/20240101000000.export.CSV.zip")
+
+
+def test_download_and_parse_truncated_zip(monkeypatch):
+    """A truncated download must raise instead of silently returning partial data."""
+    body = _make_export_zip([("EG", 4, 19, -10.0, "http://example.com/a")] * 100)
+    monkeypatch.setattr(
+        fetch_gdelt._SESSION, "get", lambda *a, **kw: _FakeResponse(body[: len(body) // 2], 64)
+    )
+
+    with pytest.raises(EOFError):
+        download_and_parse("http://example.com/20240101000000.export.CSV.zip")
@@ -1,19 +1,35 @@
 """Tests for scripts/run_kodoku_engine.py – KODOKU Engine V2 context verification."""
 
+import json
+import math
 import sys
-from pathlib import Path
 
+import numpy as np
 import pytest
 
-# Ensure scripts/ is importable
-sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
-
 from run_kodoku_engine import (
     HISTORICAL_CRISES,
     MARITIME_KEYWORDS,
+    _COUNTRY_KEYS,
+    _DECAY,
+    _NEIGHBOR_DECAY,
+    _NEIGHBOR_IDX,
+    _NEIGHBOR_PTR,
+    _classify_events,
+    _context_key,
+    _context_multiplier_impl,
+    _context_multipliers,
+    _disruption_kernel_numba,
+    _disruption_kernel_numpy,
+    _event_count_matrix,
+    _pack_risk_data,
     compute_context_multiplier,
+    compute_context_multiplier_batch,
     compute_chokepoint_disruption,
     haversine_km,
+    haversine_km_vec,
+    load_risk_data,
+    text_has_maritime,
 )
 
 
@@ -26,11 +42,16 @@ def test_historical_crises_has_required_keys():
 
 
 def test_suez_blockade_weight():
-    assert HISTORICAL_CRISES["suez_blockade"]["weight"] == 2.0
+    assert HISTORICAL_CRISES["suez_blockade"].weight == 2.0
 
 
 def test_internal_unrest_weight():
-    assert HISTORICAL_CRISES["internal_unrest"]["weight"] == 0.1
+    assert math.isclose(HISTORICAL_CRISES["internal_unrest"].weight, 0.1)
+
+
+def test_historical_crises_is_read_only():
+    with pytest.raises(TypeError):
+        HISTORICAL_CRISES["suez_blockade"] = None
 
 
 def test_maritime_keywords_defined():
@@ -39,48 +60,94 @@ def test_maritime_keywords_defined():
     assert "missile" in MARITIME_KEYWORDS
 
 
-# ---------- compute_context_multiplier ----------
+# ---------- haversine ----------
 
-def test_context_multiplier_internal_protest_no_maritime():
-    """Majority protests + no maritime keywords → 0.1 (attenuate)."""
-    country = {
-        "risk_score": 10.0,
-        "event_codes": {"14": 8, "1": 2},
-        "keywords": ["protest", "election", "police"],
-    }
-    assert compute_context_multiplier(country) == pytest.approx(0.1)
+def test_haversine_km_vec_matches_scalar():
+    """The broadcasting NumPy version must agree with the scalar helper."""
+    pairs = [
+        (32.35, 30.60, 34.85, 31.05),   # Suez – ISR
+        (56.48, 26.56, 53.69, 32.43),   # Hormuz – IRN
+        (-79.91, 9.08, 100.0, 4.0),     # Panama – Malacca (long haul)
+    ]
+    lon1, lat1, lon2, lat2 = (np.array(col) for col in zip(*pairs))
+    expected = [haversine_km(*p) for p in pairs]
+    np.testing.assert_allclose(haversine_km_vec(lon1, lat1, lon2, lat2), expected, rtol=1e-6)
 
 
-def test_context_multiplier_military_with_maritime():
-    """Military events + maritime keywords → 2.0 (amplify)."""
-    country = {
-        "risk_score": 10.0,
-        "event_codes": {"19": 5, "14": 2},
-        "keywords": ["missile", "tanker", "attack"],
-    }
-    assert compute_context_multiplier(country) == pytest.approx(2.0)
+# ---------- load_risk_data ----------
 
+def test_load_risk_data_interns_keys(tmp_path):
+    path = tmp_path / "daily_risk_score.json"
+    path.write_text(json.dumps({"IRN": {"risk_score": 4.0, "event_codes": {"19": 3}}}), encoding="utf-8")
+    data = load_risk_data(path)
+    (iso3,) = data
+    (code,) = data["IRN"]["event_codes"]
+    assert iso3 is sys.intern("IRN")
+    assert code is sys.intern("19")
 
-def test_context_multiplier_default():
-    """Mixed events without clear pattern → 1.0 (no change)."""
-    country = {
-        "risk_score": 5.0,
-        "event_codes": {"18": 5, "14": 3},
-        "keywords": ["border", "conflict", "region"],
-    }
-    assert compute_context_multiplier(country) == pytest.approx(1.0)
+
+# ---------- compute_context_multiplier ----------
+
+CONTEXT_MULTIPLIER_CASES = [
+    pytest.param(
+        {"risk_score": 10.0, "event_codes": {"14": 8, "1": 2}, "keywords": ["protest", "election", "police"]},
+        0.1,
+        id="internal_protest_no_maritime",   # majority protests + no maritime keywords → attenuate
+    ),
+    pytest.param(
+        {"risk_score": 10.0, "event_codes": {"19": 5, "14": 2}, "keywords": ["missile", "tanker", "attack"]},
+        2.0,
+        id="military_with_maritime",         # military events + maritime keywords → amplify
+    ),
+    pytest.param(
+        {"risk_score": 5.0, "event_codes": {"18": 5, "14": 3}, "keywords": ["border", "conflict", "region"]},
+        1.0,
+        id="default",                        # mixed events without clear pattern → no change
+    ),
+    pytest.param(
+        {"risk_score": 5.0, "event_codes": {}, "keywords": []},
+        1.0,
+        id="empty_event_codes",
+    ),
+    pytest.param(
+        {"risk_score": 5.0},
+        1.0,
+        id="missing_event_codes",            # backward compat
+    ),
+    pytest.param(
+        {
+            "risk_score": 10.0,
+            "event_codes": {"19": 5, "14": 2},
+            "top_news": "https://example.com/news/houthi-missile-hits-tanker-in-red-sea",
+        },
+        2.0,
+        id="scans_top_news_without_keywords",
+    ),
+]
 
 
-def test_context_multiplier_empty_event_codes():
-    """No event codes → 1.0."""
-    country = {"risk_score": 5.0, "event_codes": {}, "keywords": []}
-    assert compute_context_multiplier(country) == pytest.approx(1.0)
+@pytest.mark.parametrize("country,expected", CONTEXT_MULTIPLIER_CASES)
+def test_context_multiplier(country, expected):
+    # The multiplier is returned verbatim from HISTORICAL_CRISES (or 1.0), so compare exactly
+    assert compute_context_multiplier(country) == expected
 
 
-def test_context_multiplier_missing_event_codes():
-    """Missing event_codes key → 1.0 (backward compat)."""
-    country = {"risk_score": 5.0}
-    assert compute_context_multiplier(country) == pytest.approx(1.0)
+def test_context_multiplier_batch_matches_cases():
+    """The batch API returns the whole case table in one array."""
+    countries = [case.values[0] for case in CONTEXT_MULTIPLIER_CASES]
+    expected = [case.values[1] for case in CONTEXT_MULTIPLIER_CASES]
+    np.testing.assert_allclose(compute_context_multiplier_batch(countries), expected, rtol=1e-6)
+
+
+def test_context_multiplier_impl_matches_vectorized():
+    """The scalar decision function agrees with the array version on every branch."""
+    grid = [(p, m, h) for p in (0.0, 0.5, 0.6) for m in (0.0, 0.3) for h in (False, True)]
+    share_protest, share_military, has_maritime = (np.array(col) for col in zip(*grid))
+    np.testing.assert_allclose(
+        [_context_multiplier_impl(*case) for case in grid],
+        _context_multipliers(share_protest, share_military, has_maritime),
+        rtol=1e-6,
+    )
 
 
 def test_context_multiplier_protest_with_maritime_not_attenuated():
@@ -91,7 +158,43 @@ def test_context_multiplier_protest_with_maritime_not_attenuated():
         "keywords": ["protest", "canal", "blocked"],
     }
     # Has maritime keywords, so not attenuated even though mostly protests
-    assert compute_context_multiplier(country) != pytest.approx(0.1)
+    assert not math.isclose(compute_context_multiplier(country), 0.1)
+
+
+def test_classify_events_shares():
+    """Protest share is code 14; military share is codes 19 and 20."""
+    np.testing.assert_allclose(_classify_events({"14": 6, "19": 1, "20": 1, "1": 2}), [0.6, 0.2, 10], rtol=1e-6)
+    assert _classify_events({}) == (0.0, 0.0, 0)
+
+
+def test_context_key_ignores_dict_order_and_unused_fields():
+    """Equivalent country dicts share one cache entry."""
+    a = {"risk_score": 1.0, "event_codes": {"14": 2, "19": 1}, "keywords": ["canal"], "top_news": "x"}
+    b = {"risk_score": 9.0, "event_codes": {"19": 1, "14": 2}, "keywords": ["canal"], "top_news": "y"}
+    assert _context_key(a) == _context_key(b)
+    assert compute_context_multiplier(a) == compute_context_multiplier(b)
+
+
+def test_event_count_matrix_columns():
+    """Column j holds CAMEO root code j+1; unknown keys only count toward the total."""
+    counts, totals = _event_count_matrix([{"event_codes": {"14": 6, "20": 1, "xx": 3}}, {}])
+    assert counts.shape == (2, 20)
+    assert counts[0, 13] == 6 and counts[0, 19] == 1
+    assert counts[0].sum() == 7 and not counts[1].any()
+    np.testing.assert_allclose(totals, [10, 0])
+
+
+# ---------- text_has_maritime ----------
+
+def test_text_has_maritime_matches_whole_words():
+    assert text_has_maritime("https://example.com/world/Suez-Canal-blocked")
+    assert text_has_maritime("tanker_seized")
+
+
+def test_text_has_maritime_ignores_partial_words():
+    assert not text_has_maritime("https://example.com/passport-portal-reopens")
+    assert not text_has_maritime("")
+    assert not text_has_maritime(None)
 
 
 # ---------- compute_chokepoint_disruption with context ----------
@@ -132,3 +235,28 @@ def test_disruption_with_legacy_data():
     result = compute_chokepoint_disruption(risk_data)
     assert "hormuz" in result
     assert result["hormuz"]["disruption_risk"] >= 0
+
+
+def test_pack_risk_data_aligns_with_decay_columns():
+    """Packed arrays follow the _DECAY column order; countries without a centroid are dropped."""
+    risk_data = {
+        "IRN": {"risk_score": 6.0, "event_codes": {"19": 3}, "keywords": ["strait"]},
+        "EGY": {"risk_score": 3.0, "event_codes": {"14": 9, "1": 1}, "keywords": ["election"]},
+        "USA": {"risk_score": 9.0},  # no centroid → ignored
+    }
+    packed = _pack_risk_data(risk_data)
+    assert packed.scores.shape == packed.multipliers.shape == (_DECAY.shape[1],)
+    idx = [_COUNTRY_KEYS.index("IRN"), _COUNTRY_KEYS.index("EGY")]
+    np.testing.assert_allclose(packed.scores[idx], [6.0, 3.0], rtol=1e-6)
+    np.testing.assert_allclose(packed.multipliers[idx], [2.0, 0.1], rtol=1e-6)
+    assert packed.scores.sum() == 9.0
+
+
+def test_disruption_kernels_agree():
+    """Both distance-gated kernels give identical sums, equal to the dense mat-vec."""
+    rng = np.random.default_rng(0)
+    scores = rng.uniform(0.0, 10.0, _DECAY.shape[1])
+    mults = rng.choice([0.1, 1.0, 2.0], _DECAY.shape[1])
+    gated = (_NEIGHBOR_PTR, _NEIGHBOR_IDX, _NEIGHBOR_DECAY, scores, mults)
+    np.testing.assert_array_equal(_disruption_kernel_numba(*gated), _disruption_kernel_numpy(*gated))
+    np.testing.assert_allclose(_disruption_kernel_numpy(*gated), _DECAY @ (scores * mults), rtol=1e-12)